@@ -0,0 +1,85 @@
+# Compact bitext pool for random sampling.
+# The json of every segment is packed into one file after a table of offsets:
+#   count, offsets[0..count] as little endian uint64, then the segment data.
+# The file is memory-mapped, so sampling only reads the chosen segments and
+# costs O(sample size), and no per-token Python strings are kept in memory.
+import json
+import mmap
+import os
+import random
+import re
+import struct
+
+import pinyin2chars
+
+WHITESPACE = re.compile(r"\s*")
+
+# Packs the segments of a bitext json file, e.g. test_bitext.json, into
+# pool_fname. The segments are sliced out of the json text as they are, so the
+# whole bitext is never held as nested lists.
+def build_pool_file(json_fname, pool_fname):
+    with open(json_fname) as f:
+        text = f.read()
+    decoder = json.JSONDecoder()
+    parts = []
+    pos = WHITESPACE.match(text, 0).end()
+    if text[pos] != "[":
+        raise ValueError(json_fname + " is not a json list")
+    pos = WHITESPACE.match(text, pos + 1).end()
+    while text[pos] != "]":
+        # raw_decode() checks the segment and finds where it ends.
+        end = decoder.raw_decode(text, pos)[1]
+        parts.append(text[pos:end])
+        pos = WHITESPACE.match(text, end).end()
+        if text[pos] == ",":
+            pos = WHITESPACE.match(text, pos + 1).end()
+    offsets = [0]
+    for part in parts:
+        offsets.append(offsets[-1] + len(part))
+    # Several server workers may build the file at the same time.
+    tmp_fname = pool_fname + "." + str(os.getpid()) + ".tmp"
+    f = open(tmp_fname, "wb")
+    f.write(struct.pack("<Q", len(parts)))
+    f.write(struct.pack("<{0}Q".format(len(offsets)), *offsets))
+    f.write("".join(parts))
+    f.close();
+    os.rename(tmp_fname, pool_fname)
+
+# Opens the pool of json_fname, (re)building pool_fname if it is missing or
+# older than the json file.
+def open_pool(json_fname, pool_fname):
+    if not os.path.exists(pool_fname) or os.path.getmtime(pool_fname) < os.path.getmtime(json_fname):
+        print("Building bitext pool...")
+        build_pool_file(json_fname, pool_fname)
+    return BitextPool(pool_fname)
+
+class BitextPool(object):
+    def __init__(self, pool_fname):
+        with open(pool_fname, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = struct.unpack_from("<Q", self.buffer, 0)[0]
+        self.data_start = 8 * (self.size + 2)
+
+    def __len__(self):
+        return self.size
+
+    # Returns the json of segment i, a list of "char#pinyin" tokens.
+    def segment_json(self, i):
+        start, end = struct.unpack_from("<2Q", self.buffer, 8 * (i + 1))
+        return self.buffer[self.data_start + start:self.data_start + end]
+
+    def sample_indices(self, sample_size):
+        return random.sample(xrange(self.size), min(sample_size, self.size))
+
+    # Returns a json list of sampled segments as lists of "char#pinyin" tokens,
+    # or with split=True a json object {"pinyins": [...], "chars": [...]} of
+    # space separated strings, where the pinyins can be passed to /decode as is.
+    def sample_json(self, sample_size, split=False):
+        indices = self.sample_indices(sample_size)
+        if not split:
+            return "[" + ", ".join([self.segment_json(i) for i in indices]) + "]"
+        segments = [json.loads(self.segment_json(i)) for i in indices]
+        return json.dumps({
+            "pinyins": [pinyin2chars.bitext_segment_to_pinyin_str(segment) for segment in segments],
+            "chars": [pinyin2chars.bitext_segment_to_char_str(segment) for segment in segments],
+        })
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Model compaction: prunes the bigram table and quantizes its log probabilities.
+# Smaller tables take less memory per server worker and keep the decoder's
+# bigram lookups cheaper.
+import argparse
+import base64
+import itertools
+import json
+import random
+import sys
+
+from array import array
+from bisect import bisect_left
+from math import exp, log
+
+import pinyin2chars
+
+# Count pruning: keeps only bigrams seen more than `threshold` times.
+# threshold=1 drops all singletons.
+def prune_bigram_counts(bigram_counts, threshold=1):
+    res = {}
+    for bigram, c in bigram_counts.iteritems():
+        if c > threshold:
+            res[bigram] = c
+    return res
+
+# Entropy-based pruning (after Stolcke 1998). Since our smoothers have no
+# explicit backoff weights, the loss of removing "w1 w2" is approximated with
+# maximum likelihood estimates as the weighted relative entropy between the
+# bigram and the unigram estimate of w2:
+#   D = P(w1, w2) * (log P(w2|w1) - log P(w2))
+# Bigrams with D < threshold are dropped.
+def entropy_prune_bigram_counts(unigram_counts, bigram_counts, threshold=1e-6):
+    N = sum(unigram_counts.values()) * 1.0
+    res = {}
+    for bigram, c in bigram_counts.iteritems():
+        tokens = bigram.split(u" ")
+        c1 = unigram_counts.get(tokens[0], 0)
+        c2 = unigram_counts.get(tokens[-1], 0)
+        if c1 == 0 or c2 == 0:
+            # No unigram estimate to fall back to, keep it.
+            res[bigram] = c
+            continue
+        D = c / N * log(c * N / (c1 * c2))
+        if D >= threshold:
+            res[bigram] = c
+    return res
+
+# Array type codes of the quantized bigram codes, by number of bits.
+CODE_TYPES = {8: 'B', 16: 'H'}
+
+# Stand-alone replacement of a smoother for the bigram decoder. The log
+# probabilities of the observed bigrams are stored as `bits`-bit codes of a
+# linear codebook, log_prob = lo + code * step. Each bigram is keyed by the
+# integer id1 * n_unigrams + id2 of its unigram ids, and the keys are kept in
+# a sorted array searched with bisect, so a bigram takes 4 bytes of key plus
+# 1 or 2 bytes of code instead of a string key in a dict. Unseen bigrams only
+# depend on w1 in our smoothers, so one unseen log probability is kept per
+# unigram. Neither the original smoother nor its count tables are needed.
+class Quantized(object):
+    # unigrams: list of unigrams, their position is their id
+    # keys: sorted array('I') of bigram keys, codes: array of their codes
+    # unseen: array('d') of unseen log probabilities by unigram id
+    def __init__(self, smoothing_label, bits, lo, step, unigrams, keys, codes, unseen, unseen_default):
+        self.smoothing_label = smoothing_label
+        self.bits = bits
+        self.lo = lo
+        self.step = step
+        self.unigrams = unigrams
+        self.ids = dict(itertools.izip(unigrams, itertools.count()))
+        self.keys = keys
+        self.codes = codes
+        self.unseen = unseen
+        self.unseen_default = unseen_default
+
+    def bigram_log_prob(self, w1, w2):
+        id1 = self.ids.get(w1)
+        if id1 == None:
+            return self.unseen_default
+        id2 = self.ids.get(w2)
+        if id2 != None:
+            key = id1 * len(self.unigrams) + id2
+            i = bisect_left(self.keys, key)
+            if i < len(self.keys) and self.keys[i] == key:
+                return self.lo + self.codes[i] * self.step
+        return self.unseen[id1]
+
+    def bigram_prob(self, w1, w2):
+        return exp(self.bigram_log_prob(w1, w2))
+
+# Builds a Quantized model from a Laplace or WittenBell smoother.
+def quantize(smoother, smoothing_label, bits=8):
+    if not bits in CODE_TYPES:
+        raise ValueError("bits must be 8 or 16")
+    unigrams = set(smoother.unigram_counts.keys())
+    bigrams = []
+    for bigram in smoother.bigram_counts.keys():
+        tokens = bigram.split(u" ")
+        if len(tokens) > 1:
+            bigrams.append(tokens)
+            unigrams.update(tokens)
+    unigrams = sorted(unigrams)
+    if len(unigrams) ** 2 > 2 ** 32:
+        raise ValueError("too many unigrams for 32-bit bigram keys")
+    ids = dict(itertools.izip(unigrams, itertools.count()))
+    log_probs = {}
+    for tokens in bigrams:
+        key = ids[tokens[0]] * len(unigrams) + ids[tokens[1]]
+        log_probs[key] = smoother.bigram_log_prob(tokens[0], tokens[1])
+    n_levels = 2 ** bits
+    lo = min(log_probs.values()) if log_probs else 0.0
+    hi = max(log_probs.values()) if log_probs else 0.0
+    step = (hi - lo) / (n_levels - 1) or 1.0
+    keys = array('I', sorted(log_probs.keys()))
+    codes = array(CODE_TYPES[bits], [int(round((log_probs[key] - lo) / step)) for key in keys])
+    # No bigram ends in u"", so these are the unseen log probabilities.
+    unseen = array('d', [smoother.bigram_log_prob(w1, u"") for w1 in unigrams])
+    unseen_default = smoother.bigram_log_prob(u"", u"")
+    return Quantized(smoothing_label, bits, lo, step, unigrams, keys, codes, unseen, unseen_default)
+
+# Arrays are stored little endian and base64 encoded.
+def encode_array(a):
+    if sys.byteorder == "big":
+        a = array(a.typecode, a)
+        a.byteswap()
+    return base64.b64encode(a.tostring())
+
+def decode_array(typecode, data):
+    a = array(typecode)
+    a.fromstring(base64.b64decode(data))
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a
+
+def save_quantized(fname, quantized):
+    data = {
+        "smoothing": quantized.smoothing_label,
+        "bits": quantized.bits,
+        "lo": quantized.lo,
+        "step": quantized.step,
+        "unigrams": quantized.unigrams,
+        "keys": encode_array(quantized.keys),
+        "codes": encode_array(quantized.codes),
+        "unseen": encode_array(quantized.unseen),
+        "unseen_default": quantized.unseen_default,
+    }
+    f = open(fname, 'w')
+    f.write(json.dumps(data))
+    f.close();
+
+def load_quantized(fname):
+    data = pinyin2chars.load_from_json_file(fname)
+    return Quantized(data["smoothing"], data["bits"], data["lo"], data["step"], data["unigrams"],
+        decode_array('I', data["keys"]), decode_array(CODE_TYPES[data["bits"]], data["codes"]),
+        decode_array('d', data["unseen"]), data["unseen_default"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune and quantize the bigram model, and report the accuracy impact.")
+    pruning = parser.add_mutually_exclusive_group()
+    pruning.add_argument("--threshold", type=int, default=1,
+        help="drop bigrams with count <= threshold (default: 1, singletons)")
+    pruning.add_argument("--entropy", type=float, default=None,
+        help="use entropy-based pruning with this threshold instead of count pruning")
+    parser.add_argument("--bits", type=int, choices=[0, 8, 16], default=8,
+        help="quantize bigram log probabilities to this many bits, 0 to disable (default: 8)")
+    parser.add_argument("--smoothing", choices=["laplace", "wittenbell"], default="laplace")
+    parser.add_argument("--sample", type=int, default=1000,
+        help="number of test_bitext.json segments to evaluate on, at least 10, or 0 for all (default: 1000)")
+    parser.add_argument("--output", default="pruned_bigram_counts.json")
+    parser.add_argument("--quantized-output", default="quantized_bigrams.json",
+        help="where to write the pruned and quantized model (default: quantized_bigrams.json)")
+    args = parser.parse_args()
+    # get_accuracy() reports progress in steps of a tenth of the segments.
+    if args.sample < 0 or 0 < args.sample < 10:
+        parser.error("--sample must be 0 or at least 10")
+
+    unigram_counts = pinyin2chars.load_from_json_file("unigram_counts.json")
+    bigram_counts = pinyin2chars.load_from_json_file("bigram_counts.json")
+    candidate_map = pinyin2chars.load_from_json_file("candidate_map.json")
+    bitext_testing = pinyin2chars.load_from_json_file("test_bitext.json")
+    if args.sample and args.sample < len(bitext_testing):
+        bitext_testing = random.sample(bitext_testing, args.sample)
+
+    if args.entropy != None:
+        pruned_counts = entropy_prune_bigram_counts(unigram_counts, bigram_counts, args.entropy)
+    else:
+        pruned_counts = prune_bigram_counts(bigram_counts, args.threshold)
+    print("{0} of {1} bigrams kept.".format(len(pruned_counts), len(bigram_counts)))
+
+    f = open(args.output, 'w')
+    f.write(json.dumps(pruned_counts))
+    f.close();
+
+    smoother = pinyin2chars.get_smoother(args.smoothing, unigram_counts, bigram_counts)
+    print("full model accuracy:")
+    print(pinyin2chars.get_accuracy("bigram", bitext_testing, unigram_counts, candidate_map, smoother))
+
+    compact_smoother = pinyin2chars.get_smoother(args.smoothing, unigram_counts, pruned_counts)
+    print("pruned model accuracy:")
+    print(pinyin2chars.get_accuracy("bigram", bitext_testing, unigram_counts, candidate_map, compact_smoother))
+
+    if args.bits:
+        compact_smoother = quantize(compact_smoother, args.smoothing, args.bits)
+        save_quantized(args.quantized_output, compact_smoother)
+        print("pruned {0}-bit quantized model accuracy:".format(args.bits))
+        print(pinyin2chars.get_accuracy("bigram", bitext_testing, unigram_counts, candidate_map, compact_smoother))
+
+if __name__ == "__main__":
+    main()
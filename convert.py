@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Batch conversion of pinyin lines to characters using the prebuilt language
+# model json files. Reads one pinyin segment per line from a file or stdin and
+# writes the decoded characters, separated by spaces, to stdout in input order.
+# Lines that cannot be decoded produce an empty line, and decoding errors are
+# reported with their line number on stderr.
+import argparse
+import collections
+import codecs
+import multiprocessing
+import re
+import sys
+
+import compaction
+import pinyin2chars
+
+# Per-process model state, set by init_decoder().
+decoder = {}
+
+# quantized_file: a model written by compaction.py, used instead of
+# bigram_counts_file and smoothing_label for the bigram model.
+def init_decoder(model, smoothing_label, has_tone, bigram_counts_file="bigram_counts.json", quantized_file=None):
+    decoder["model"] = model
+    decoder["has_tone"] = has_tone
+    decoder["candidate_map"] = pinyin2chars.load_from_json_file("candidate_map.json")
+    decoder["unigram_counts"] = pinyin2chars.load_from_json_file("unigram_counts.json")
+    if model != "bigram":
+        return
+    if quantized_file != None:
+        decoder["smoother"] = compaction.load_quantized(quantized_file)
+        return
+    bigram_counts = pinyin2chars.load_from_json_file(bigram_counts_file)
+    decoder["smoother"] = pinyin2chars.get_smoother(smoothing_label, decoder["unigram_counts"], bigram_counts)
+
+# line_number: 1-based input line number, for error messages
+def decode_line(pinyin_str, line_number):
+    pinyin_str = pinyin_str.strip()
+    if not pinyin_str:
+        return u""
+    has_tone = decoder["has_tone"]
+    if not has_tone:
+        pinyin_str = re.sub(r"\d", "", pinyin_str)
+    chars = None
+    # The decoders print debugging output; keep it out of the converted text.
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        if decoder["model"] == "bigram":
+            chars = pinyin2chars.convert_bigram_dp(pinyin_str, decoder["smoother"], decoder["candidate_map"], has_tone)
+        elif decoder["model"] == "unigram":
+            chars = pinyin2chars.convert_unigram(pinyin_str, decoder["unigram_counts"], decoder["candidate_map"], has_tone)
+        elif decoder["model"] == "baseline":
+            chars = pinyin2chars.convert_baseline(pinyin_str, decoder["candidate_map"], has_tone)
+    except (KeyError, AttributeError) as e:
+        # The bigram decoders fail this way when no decoding can be traced back.
+        sys.stderr.write("line {0}: {1}: {2}\n".format(line_number, type(e).__name__, e))
+        return u""
+    finally:
+        sys.stdout = stdout
+    if not chars:
+        sys.stderr.write("line {0}: no decoding found\n".format(line_number))
+        return u""
+    return u" ".join(chars)
+
+# first_line_number: input line number of lines[0]
+def decode_chunk(first_line_number, lines):
+    return [decode_line(line, first_line_number + i) for i, line in enumerate(lines)]
+
+# Yields (first_line_number, lines) chunks.
+def read_chunks(f, chunk_size):
+    chunk = []
+    first_line_number = 1
+    for line in f:
+        chunk.append(line)
+        if len(chunk) == chunk_size:
+            yield first_line_number, chunk
+            first_line_number += len(chunk)
+            chunk = []
+    if chunk:
+        yield first_line_number, chunk
+
+# Yields decoded chunks in input order. With a pool, at most 2 chunks per
+# process are in flight so the input is never read ahead unboundedly.
+def convert_chunks(chunks, pool=None, processes=1):
+    if pool == None:
+        for first_line_number, chunk in chunks:
+            yield decode_chunk(first_line_number, chunk)
+        return
+    pending = collections.deque()
+    for first_line_number, chunk in chunks:
+        pending.append(pool.apply_async(decode_chunk, (first_line_number, chunk)))
+        if len(pending) >= 2 * processes:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pinyin lines to characters using the prebuilt language model.")
+    parser.add_argument("input", nargs="?", default="-",
+        help="file with one pinyin segment per line, - for stdin (default)")
+    parser.add_argument("--model", choices=["bigram", "unigram", "baseline"], default="bigram")
+    parser.add_argument("--smoothing", choices=["laplace", "wittenbell", "goodturing"], default="laplace")
+    bigram_model = parser.add_mutually_exclusive_group()
+    bigram_model.add_argument("--bigram-counts", default="bigram_counts.json",
+        help="bigram counts to smooth, e.g. pruned_bigram_counts.json (default: bigram_counts.json)")
+    bigram_model.add_argument("--quantized",
+        help="use a quantized bigram model written by compaction.py, ignores --smoothing")
+    parser.add_argument("--no-tones", dest="has_tone", action="store_false",
+        help="input pinyins have no tone numbers")
+    parser.add_argument("--chunk-size", type=int, default=100,
+        help="number of lines decoded per task (default: 100)")
+    parser.add_argument("--processes", type=int, default=1,
+        help="number of decoding processes (default: 1)")
+    args = parser.parse_args()
+    if args.chunk_size < 1 or args.processes < 1:
+        parser.error("--chunk-size and --processes must be positive")
+    # gt_smoothed_counts.json only matches the full bigram counts, and pruned
+    # counts lack the singletons Good Turing discounts with.
+    if args.smoothing == "goodturing" and args.bigram_counts != "bigram_counts.json":
+        parser.error("--smoothing goodturing only works with the full bigram_counts.json")
+
+    if args.input == "-":
+        f = codecs.getreader("utf-8")(sys.stdin)
+    else:
+        f = codecs.open(args.input, encoding="utf-8")
+    out = codecs.getwriter("utf-8")(sys.stdout)
+
+    pool = None
+    init_args = (args.model, args.smoothing, args.has_tone, args.bigram_counts, args.quantized)
+    if args.processes > 1:
+        pool = multiprocessing.Pool(args.processes, init_decoder, init_args)
+    else:
+        init_decoder(*init_args)
+    try:
+        for chunk in convert_chunks(read_chunks(f, args.chunk_size), pool, args.processes):
+            for line in chunk:
+                out.write(line + u"\n")
+            out.flush()
+    finally:
+        if pool != None:
+            pool.terminate()
+        f.close()
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ import copy
 import re
 import json
 import operator
+import os
 
 from random import randint
 from math import log
@@ -107,6 +108,63 @@ def get_ngram_counts(text, n):
             head += 1
     return ngram_counts
 
+# Adds the counts in delta to ngram_counts in place.
+def add_ngram_counts(ngram_counts, delta):
+    for gram in delta.keys():
+        ngram_counts[gram] = ngram_counts.get(gram, 0) + delta[gram]
+
+# Adds the "char#pinyin" pairs of the bitext to the candidate map in place.
+def add_candidates(candidate_map, text):
+    for segment in text:
+        for token in segment:
+            tokens = token.split(u"#")
+            if (not tokens[1] in candidate_map):
+                candidate_map[tokens[1]] = []
+            if (not tokens[0] in candidate_map[tokens[1]]):
+                candidate_map[tokens[1]].append(tokens[0])
+
+def load_from_json_file(fname):
+    with open(fname) as f:
+        return json.load(f)
+
+# Writes to a temporary file first so readers never see a partial file.
+def write_json_file(fname, data):
+    f = open(fname + '.tmp', 'w')
+    f.write(json.dumps(data))
+    f.close();
+    os.rename(fname + '.tmp', fname)
+
+# The model version file is set to MODEL_UPDATING before any model file is
+# rewritten and to a new version once all of them are written, so readers can
+# tell a complete set of files apart from one that is being updated.
+MODEL_VERSION_FILE = "model_version"
+MODEL_UPDATING = "updating"
+
+def write_model_version(version):
+    f = open(MODEL_VERSION_FILE + '.tmp', 'w')
+    f.write(version)
+    f.close();
+    os.rename(MODEL_VERSION_FILE + '.tmp', MODEL_VERSION_FILE)
+
+# Returns None if no model version was written yet.
+def read_model_version():
+    try:
+        with open(MODEL_VERSION_FILE) as f:
+            return f.read()
+    except IOError:
+        return None
+
+# smoothing_label: "laplace|wittenbell|goodturing"
+# Good Turing loads its precomputed smoothed unigram counts from gt_smoothed_counts_file.
+def get_smoother(smoothing_label, unigram_counts, bigram_counts, gt_smoothed_counts_file="gt_smoothed_counts.json"):
+    if smoothing_label == "laplace":
+        return smoothing.Laplace(unigram_counts, bigram_counts)
+    if smoothing_label == "wittenbell":
+        return smoothing.WittenBell(unigram_counts, bigram_counts)
+    if smoothing_label == "goodturing":
+        return smoothing.GoodTuring(unigram_counts, bigram_counts, load_from_json_file(gt_smoothed_counts_file))
+    raise ValueError("unknown smoothing: " + smoothing_label)
+
 # Baseline: randomly pick a candicate character
 # pinyin_str: string of pinyin tokens, no start/end symbol
 # returns a list of predicted characters
@@ -1,25 +1,51 @@
 from flask import Flask, request, send_from_directory
-import json
-import random
+import os
+import bitextpool
+import compaction
 import pinyin2chars
-import smoothing
-
-def load_from_json_file(fname):
-    with open(fname) as f:
-        content = f.readlines()
-    data = u"".join(content)
-    return json.loads(data)
-
-print("Loading language model...")
-candidate_map = load_from_json_file("candidate_map.json")
-unigram_counts = load_from_json_file("unigram_counts.json")
-bigram_counts = load_from_json_file("bigram_counts.json")
-print("Initalizing smoothed counts...")
-lp_smoother = smoothing.Laplace(unigram_counts, bigram_counts)
-wb_smoother = smoothing.WittenBell(unigram_counts, bigram_counts)
-gt_smoother = smoothing.GoodTuring(unigram_counts, bigram_counts, load_from_json_file("gt_smoothed_counts.json"))
-test_bitext = load_from_json_file("test_bitext.json")
-smoothers = {"laplace": lp_smoother, "wittenbell": wb_smoother, "goodturing": gt_smoother}
+
+# Set QUANTIZED_MODEL to a model written by compaction.py to serve bigram
+# decoding from it instead of bigram_counts.json.
+QUANTIZED_MODEL = os.environ.get("QUANTIZED_MODEL")
+
+# Returns a fully built model. Requests only read the global `model` once, so
+# assigning a new one swaps all tables and smoothers atomically.
+def load_model():
+    print("Loading language model...")
+    version = pinyin2chars.read_model_version()
+    candidate_map = pinyin2chars.load_from_json_file("candidate_map.json")
+    unigram_counts = pinyin2chars.load_from_json_file("unigram_counts.json")
+    smoothers = {}
+    if QUANTIZED_MODEL:
+        # Only the smoothing the model was quantized with is available.
+        quantized = compaction.load_quantized(QUANTIZED_MODEL)
+        smoothers[quantized.smoothing_label] = quantized
+    else:
+        bigram_counts = pinyin2chars.load_from_json_file("bigram_counts.json")
+        print("Initalizing smoothed counts...")
+        for label in ["laplace", "wittenbell", "goodturing"]:
+            smoothers[label] = pinyin2chars.get_smoother(label, unigram_counts, bigram_counts)
+    return {"candidate_map": candidate_map, "unigram_counts": unigram_counts, "smoothers": smoothers, "version": version}
+
+model = load_model()
+
+# Every worker process checks the model version on each request and reloads
+# once update.py has written a complete new set of model files. A model is
+# discarded if the version changed while it was being loaded. A quantized
+# model is not rebuilt by update.py, so it is never mixed with newer unigram
+# and candidate tables; rerun compaction.py and restart the server instead.
+def get_model():
+    global model
+    if QUANTIZED_MODEL:
+        return model
+    version = pinyin2chars.read_model_version()
+    if version == model["version"] or version == pinyin2chars.MODEL_UPDATING:
+        return model
+    new_model = load_model()
+    if new_model["version"] == version and pinyin2chars.read_model_version() == version:
+        model = new_model
+    return model
+test_bitext = bitextpool.open_pool("test_bitext.json", "test_bitext.pool")
 
 # set the project root directory as the static folder, you can set others.
 app = Flask(__name__, static_url_path='')
@@ -34,27 +60,31 @@ def root():
 
 @app.route('/decode')
 def decode_api():
-    model = request.args.get('model')
+    m = get_model()
+    model_label = request.args.get('model')
     pinyin_str = request.args.get('pinyins')
-    smoother = smoothers[request.args.get('smoothing')]
+    smoother = m["smoothers"].get(request.args.get('smoothing'))
     has_tone = request.args.get('tone') == "withtones"
     chars = None
-    if model == "bigram":
-        chars = pinyin2chars.convert_bigram_dp(pinyin_str, smoother, candidate_map, has_tone)
-    elif model == "unigram":
-        chars = pinyin2chars.convert_unigram(pinyin_str, unigram_counts, candidate_map, has_tone)
-    elif model == "baseline":
-        chars = pinyin2chars.convert_baseline(pinyin_str, candidate_map, has_tone)
+    if model_label == "bigram":
+        if smoother == None:
+            return "Smoothing not available for the loaded model."
+        chars = pinyin2chars.convert_bigram_dp(pinyin_str, smoother, m["candidate_map"], has_tone)
+    elif model_label == "unigram":
+        chars = pinyin2chars.convert_unigram(pinyin_str, m["unigram_counts"], m["candidate_map"], has_tone)
+    elif model_label == "baseline":
+        chars = pinyin2chars.convert_baseline(pinyin_str, m["candidate_map"], has_tone)
     if chars == None:
         return "Invalid input or no decoding found."
     return u"|".join(chars)
     return test_str
 
+# format=split returns pinyin and character strings instead of token lists.
 @app.route('/bitext')
 def bitext_api():
     sample_size = int(request.args.get('size'))
-    rand_smpl = [ test_bitext[i] for i in random.sample(xrange(len(test_bitext)), sample_size) ]
-    return json.dumps(rand_smpl)
+    split = request.args.get('format') == "split"
+    return test_bitext.sample_json(sample_size, split)
 
 if __name__ == "__main__":
     app.run()
\ No newline at end of file
@@ -45,6 +45,9 @@ class WittenBell(object):
         return log(prob)
 
 class GoodTuring(object):
+    # Only discount up to c = k
+    K = 5
+
     def __init__(self, unigram_counts, bigram_counts, smoothed_counts=None):
         self.unigram_counts = unigram_counts
         self.bigram_counts = bigram_counts
@@ -52,32 +55,70 @@ class GoodTuring(object):
         self.smoothed_uc = {}
         self.N = {}
         self.N_tot = 0
-        # Only discount up to c = k
-        K = 5
-        N = self.N
         for bigram in bigram_counts.keys():
             c = self.bigram_counts[bigram]
             self.N_tot += c
             self.N[c] = self.N.get(c, 0) + 1
 
         for bigram in bigram_counts.keys():
-            c = self.bigram_counts[bigram] * 1.0
-            if c <= K:
-                c = ((c + 1) * N[c + 1] * 1.0 / N[c] - \
-                    c * (K + 1) * N[K + 1] * 1.0 / N[1]) / \
-                    (1 - (K + 1) * N[K + 1] * 1.0 / N[1])
-            self.smoothed_bc[bigram] = c
+            self.smoothed_bc[bigram] = self.discount(self.bigram_counts[bigram])
 
         if smoothed_counts == None:
             unigrams = list(unigram_counts.keys())
             for wi in unigrams:
-                uc = 0
-                for wj in unigrams:
-                    uc += self.bigram_count(wi, wj)
-                self.smoothed_uc[wi] = uc
+                self.smoothed_uc[wi] = self.smoothed_unigram_count(wi, unigrams)
         else:
             self.smoothed_uc = smoothed_counts
 
+    def discount(self, c):
+        K = self.K
+        N = self.N
+        c = c * 1.0
+        if c <= K:
+            c = ((c + 1) * N[c + 1] * 1.0 / N[c] - \
+                c * (K + 1) * N[K + 1] * 1.0 / N[1]) / \
+                (1 - (K + 1) * N[K + 1] * 1.0 / N[1])
+        return c
+
+    def smoothed_unigram_count(self, wi, unigrams):
+        uc = 0
+        for wj in unigrams:
+            uc += self.bigram_count(wi, wj)
+        return uc
+
+    # Call after unigram_delta and bigram_delta were added to the count tables.
+    # Any change of the count-of-counts or N_tot changes the discount of every
+    # bigram with c <= K and the unseen mass of every row, so all smoothed
+    # counts are recomputed. Each smoothed unigram count is summed over the
+    # observed bigrams of its row plus the unseen mass of the rest, which gives
+    # the same result as __init__ in O(bigrams + unigrams) instead of
+    # O(unigrams^2).
+    def update(self, unigram_delta, bigram_delta):
+        N = self.N
+        for bigram, delta in bigram_delta.iteritems():
+            c = self.bigram_counts[bigram]
+            if c - delta > 0:
+                N[c - delta] -= 1
+                if N[c - delta] == 0:
+                    del N[c - delta]
+            N[c] = N.get(c, 0) + 1
+            self.N_tot += delta
+        for bigram in self.bigram_counts.keys():
+            self.smoothed_bc[bigram] = self.discount(self.bigram_counts[bigram])
+
+        seen_uc = {}
+        seen_types = {}
+        for bigram, bc in self.smoothed_bc.iteritems():
+            tokens = bigram.split(" ")
+            # bigram_count() treats a zero smoothed count as unseen.
+            if len(tokens) > 1 and bc != 0 and tokens[1] in self.unigram_counts:
+                seen_uc[tokens[0]] = seen_uc.get(tokens[0], 0) + bc
+                seen_types[tokens[0]] = seen_types.get(tokens[0], 0) + 1
+        unseen_bc = self.N[1] * 1.0 / self.N_tot
+        V = len(self.unigram_counts.keys())
+        self.smoothed_uc = {}
+        for wi in self.unigram_counts.keys():
+            self.smoothed_uc[wi] = seen_uc.get(wi, 0) + (V - seen_types.get(wi, 0)) * unseen_bc
 
     def bigram_count(self, w1, w2):
         bigram = w1 + u" " + w2
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Incremental model update: adds the counts of new bitext segments to the
+# language model json files without retraining from the database.
+# The bitext file has the format of test_bitext.json, a list of segments of
+# "char#pinyin" tokens. Running servers switch to the new files once all of
+# them are written, see pinyin2chars.MODEL_VERSION_FILE.
+import argparse
+import time
+
+import pinyin2chars
+import smoothing
+
+# Largest relative difference between the smoothed unigram counts of the
+# updated smoother and of a full GoodTuring recompute. Takes O(unigrams^2).
+def check_good_turing(smoother):
+    full = smoothing.GoodTuring(smoother.unigram_counts, smoother.bigram_counts)
+    if set(full.smoothed_uc.keys()) != set(smoother.smoothed_uc.keys()):
+        return float("inf")
+    diff = 0.0
+    for wi, uc in full.smoothed_uc.iteritems():
+        diff = max(diff, abs(smoother.smoothed_uc[wi] - uc) / uc)
+    return diff
+
+def main():
+    parser = argparse.ArgumentParser(description="Add new bitext segments to the language model json files.")
+    parser.add_argument("bitext", help="json file with a list of segments of \"char#pinyin\" tokens")
+    parser.add_argument("--check", action="store_true",
+        help="compare the updated Good Turing counts with a full recompute before writing (slow)")
+    args = parser.parse_args()
+
+    bitext = pinyin2chars.load_from_json_file(args.bitext)
+    candidate_map = pinyin2chars.load_from_json_file("candidate_map.json")
+    unigram_counts = pinyin2chars.load_from_json_file("unigram_counts.json")
+    bigram_counts = pinyin2chars.load_from_json_file("bigram_counts.json")
+    # Built from the old counts, then updated with the deltas below.
+    smoother = pinyin2chars.get_smoother("goodturing", unigram_counts, bigram_counts)
+
+    unigram_delta = pinyin2chars.get_ngram_counts(bitext, 1)
+    bigram_delta = pinyin2chars.get_ngram_counts(bitext, 2)
+    pinyin2chars.add_ngram_counts(unigram_counts, unigram_delta)
+    pinyin2chars.add_ngram_counts(bigram_counts, bigram_delta)
+    pinyin2chars.add_candidates(candidate_map, bitext)
+    print("Updating smoothing...")
+    smoother.update(unigram_delta, bigram_delta)
+    if args.check:
+        diff = check_good_turing(smoother)
+        print("Largest relative difference to a full recompute: {0}".format(diff))
+        if diff > 1e-9:
+            raise SystemExit("Good Turing update does not match a full recompute, nothing written.")
+
+    pinyin2chars.write_model_version(pinyin2chars.MODEL_UPDATING)
+    pinyin2chars.write_json_file('candidate_map.json', candidate_map)
+    pinyin2chars.write_json_file('unigram_counts.json', unigram_counts)
+    pinyin2chars.write_json_file('bigram_counts.json', bigram_counts)
+    pinyin2chars.write_json_file('gt_smoothed_counts.json', smoother.smoothed_uc)
+    pinyin2chars.write_model_version(repr(time.time()))
+    print("{0} segments added.".format(len(bitext)))
+
+if __name__ == "__main__":
+    main()